@@ -1,5 +1,5 @@
 import streamlit as st
-import json
+import orjson
 import tempfile
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
@@ -8,13 +8,19 @@ import datetime
 import time
 import os
 import random 
+from itertools import islice
 
 # === CONFIG ===
-DIMENSIONS = [
+DIMENSIONS = (
     "Originality", "Elaboration", "Clarity", "Coherence",
     "Semantic Density", "Not a Summary", "Engagement", "Overall"
-]
+)
+SCORE_OPTIONS = (1, 2, 3, 4)  # 4-point rating scale; also the rank positions
 PROMPTS_PER_ANNOTATOR = 2
+AUTOSAVE_MIN_INTERVAL = 30.0  # seconds an edit may stay unsaved before a rerun flushes it
+DEBUG = False  # pretty-print local autosave files
+
+_now = datetime.datetime.now  # bound once; used on every save
 
 # === LOCAL SAVE DIRECTORY ===
 # LOCAL_SAVE_DIR = "./saved_sessions"
@@ -30,148 +36,155 @@ def is_admin():
     except Exception:
         return False
 
+# === Scroll-to-top snippet (shared by page navigation and Back to Top) ===
+SCROLL_TO_TOP_JS = """
+<script>
+const selectors = [
+    '[data-testid="stVerticalBlock"]',
+    '[data-testid="stAppViewContainer"]',
+    'section.main',
+    '.block-container'
+];
+function scrollNow() {
+    selectors.forEach(sel => {
+        const el = window.parent.document.querySelector(sel);
+        if (el) {
+            el.scrollTop = 0;
+            if (el.scrollTo) el.scrollTo({top:0, behavior:'instant'});
+        }
+    });
+    window.scrollTo(0,0);
+    window.parent.scrollTo(0,0);
+    const header = window.parent.document.querySelector('h1');
+    if (header && header.scrollIntoView) header.scrollIntoView({behavior:'instant', block:'start'});
+}
+[50,150,300].forEach(ms => setTimeout(scrollNow, ms));
+</script>
+"""
+
+
+def scroll_to_top():
+    st.components.v1.html(SCROLL_TO_TOP_JS, height=0)
+
+
 # === Local Save/Load Helpers ===
 def get_local_save_path(annotator_id, session_id):
     return f"{LOCAL_SAVE_DIR}/{annotator_id}_{session_id}.json"
 
 
 def save_to_local_file(annotator_id, session_id, all_data):
-    # Convert tuple keys to strings
-    serializable_data = {
-        (f"{k[0]}__{k[1]}" if isinstance(k, tuple) else k): v
-        for k, v in all_data.items()
-    }
-    serializable_data["_autosave_timestamp"] = datetime.datetime.now().isoformat()
+    # Keys are already "mode__prompt" strings, so the dict is written as-is
+    all_data["_autosave_timestamp"] = _now().isoformat(timespec="seconds")
+
+    payload = orjson.dumps(all_data, option=orjson.OPT_INDENT_2 if DEBUG else 0)
 
     path = get_local_save_path(annotator_id, session_id)
-    with open(path, "w") as f:
-        json.dump(serializable_data, f, indent=2)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
 
+def mark_dirty():
+    # Remember when the oldest unsaved edit happened
+    if not st.session_state.get("_dirty"):
+        st.session_state["_dirty"] = True
+        st.session_state["_dirty_since"] = time.monotonic()
+
+
+def maybe_flush(annotator_id, session_id, force=False):
+    # Navigation and submit flush immediately (force). Otherwise the file is
+    # written once the oldest unsaved edit is AUTOSAVE_MIN_INTERVAL old, but
+    # only when a rerun gets here: there is no background timer, so edits stay
+    # in session state until the annotator's next interaction.
+    if not st.session_state.get("_dirty"):
+        return
+    if not force and time.monotonic() - st.session_state["_dirty_since"] < AUTOSAVE_MIN_INTERVAL:
+        return
+    save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
+    st.session_state["_dirty"] = False
+
+
+# (file name, mtime) pairs; os.scandir reuses each entry's stat result
+def list_saved_sessions():
+    with os.scandir(LOCAL_SAVE_DIR) as entries:
+        return [(e.name, e.stat().st_mtime) for e in entries if e.name.endswith(".json")]
 
 
 def load_from_local_file(annotator_id, session_id):
     path = get_local_save_path(annotator_id, session_id)
     if os.path.exists(path):
-        with open(path, "r") as f:
-            loaded = json.load(f)
-        restored = {
-            tuple(k.split("__", 1)): v
-            for k, v in loaded.items()
-            if k not in ["feedback", "_autosave_timestamp"]
-        }
-        if "feedback" in loaded:
-            restored["feedback"] = loaded["feedback"]
-        restored["_autosave_timestamp"] = loaded.get("_autosave_timestamp", "")
+        with open(path, "rb") as f:
+            restored = orjson.loads(f.read())
+        restored.setdefault("_autosave_timestamp", "")
         return restored
     return None
 
 # === Load JSON paragraph data ===
-@st.cache_data
+# cache_resource hands every rerun the same read-only dicts instead of
+# unpickling a fresh copy as cache_data does; callers must not mutate them.
+@st.cache_resource
 def load_data():
-    with open("./annotations_fic.json", "r") as f:
-        fic_paras = json.load(f)
-    with open("./annotations_non.json", "r") as f:
-        non_paras = json.load(f)
+    with open("./annotations_fic.json", "rb") as f:
+        fic_paras = orjson.loads(f.read())
+    with open("./annotations_non.json", "rb") as f:
+        non_paras = orjson.loads(f.read())
     return fic_paras, non_paras
 
-# # === Google Sheets setup ===
-# SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-# # gcp_creds = st.secrets["gcp"]
-# gcp_creds = st.secrets
-# CREDS = ServiceAccountCredentials.from_json_keyfile_dict(gcp_creds, SCOPE)
-# CLIENT = gspread.authorize(CREDS)
-# SHEET = CLIENT.open("creative_writing_annotations").sheet1
-
+# === Google Sheets setup ===
 SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-gcp_creds = st.secrets
-CREDS = ServiceAccountCredentials.from_json_keyfile_dict(gcp_creds, SCOPE)
-
-SHEET = None  
 
+# Credentials, client and worksheet are built once per process; Streamlit
+# re-executes this script on every interaction, so nothing here may run at import.
 @st.cache_resource
 def get_sheet():
-    global SHEET
-    if SHEET is None:
-        client = gspread.authorize(CREDS)
-        SHEET = client.open("creative_writing_annotations").sheet1
-    return SHEET
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(st.secrets), SCOPE)
+    return gspread.authorize(creds).open("creative_writing_annotations").sheet1
+
+
+# === Annotation keys ===
+# Tasks are stored under "mode__prompt" string keys, the same shape that is
+# written to disk and to the sheet, so saving needs no key rewriting.
+def task_key(mode, prompt):
+    return f"{mode}__{prompt}"
+
+
+# === Ranking validation ===
+def ranking_problem(rankings):
+    ranks = list(rankings.values())
+    if None in ranks:
+        return "incomplete"
+    if len(set(ranks)) < len(ranks):
+        return "duplicate"
+    return None
+
+
+def update_ranking_problem(key, rankings):
+    # Tracks which tasks still have invalid ranks, so Submit needs no full scan
+    problems = st.session_state.setdefault("_rank_problems", {})
+    problem = ranking_problem(rankings)
+    if problem:
+        problems[key] = problem
+    else:
+        problems.pop(key, None)
+    return problem
 
 
 # === Deterministic prompt assignment ===
 def get_assigned_prompts(annotator_id, prompt_keys):
+    # islice walks the dict keys view directly; no full key list is built
     id_int = int(annotator_id)
     start = (id_int - 1) * PROMPTS_PER_ANNOTATOR
-    return prompt_keys[start: start + PROMPTS_PER_ANNOTATOR]
+    return list(islice(prompt_keys, start, start + PROMPTS_PER_ANNOTATOR))
+
+
+def build_all_prompts(annotator_id, fic_paras, non_paras):
+    return tuple(
+        [("fiction", p) for p in get_assigned_prompts(annotator_id, fic_paras.keys())]
+        + [("nonfiction", p) for p in get_assigned_prompts(annotator_id, non_paras.keys())]
+    )
 
 
 # === Save annotations to Google Sheets ===
-# def save_all_annotations(annotator_id, session_id, all_data):
-#     serializable_data = {
-#         f"{k[0]}__{k[1]}": v for k, v in all_data.items() if isinstance(k, tuple)
-#     }
-#     if "feedback" in all_data:
-#         serializable_data["feedback"] = all_data["feedback"]
-
-#     json_data = json.dumps(serializable_data)
-#     timestamp = datetime.datetime.now().isoformat()
-
-#     rows = SHEET.get_all_values()
-#     row_index = None
-#     for idx, row in enumerate(rows[1:], start=2):  # Skip header
-#         if row[0] == annotator_id and row[1] == session_id:
-#             row_index = idx
-#             break
-
-#     if row_index:
-#         SHEET.update(f"A{row_index}:D{row_index}",
-#                      [[annotator_id, session_id, json_data, timestamp]])
-#     else:
-#         SHEET.append_row([annotator_id, session_id, json_data, timestamp])
-# === Save annotations to Google Sheets (optimized to prevent quota errors) with error checking ===
-# def save_all_annotations(annotator_id, session_id, all_data):
-#     serializable_data = {
-#         f"{k[0]}__{k[1]}": v for k, v in all_data.items() if isinstance(k, tuple)
-#     }
-#     if "feedback" in all_data:
-#         serializable_data["feedback"] = all_data["feedback"]
-
-#     json_data = json.dumps(serializable_data)
-#     timestamp = datetime.datetime.now().isoformat()
-
-#     # ✅ Use find() instead of get_all_values()
-#     row_index = None
-#     try:
-#         cell = SHEET.find(annotator_id)
-#         if cell:
-#             row_values = SHEET.row_values(cell.row)
-#             if len(row_values) > 1 and row_values[1] == session_id:
-#                 row_index = cell.row
-#     except Exception:
-#         row_index = None
-
-#     # ✅ Retry wrapper for 429 errors
-#     def retry_api_call(func, max_retries=5):
-#         import random, time
-#         for attempt in range(max_retries):
-#             try:
-#                 return func()
-#             except Exception as e:
-#                 if "429" in str(e):
-#                     wait_time = (2 ** attempt) + random.random()
-#                     time.sleep(wait_time)
-#                 else:
-#                     raise e
-#         raise Exception("Max retries exceeded")
-
-#     if row_index:
-#         retry_api_call(lambda: SHEET.update(
-#             f"A{row_index}:D{row_index}",
-#             [[annotator_id, session_id, json_data, timestamp]]
-#         ))
-#     else:
-#         retry_api_call(lambda: SHEET.append_row(
-#             [annotator_id, session_id, json_data, timestamp]
-#         ))
 def retry_api_call(func, max_retries=5):
     for attempt in range(max_retries):
         try:
@@ -185,21 +198,50 @@ def retry_api_call(func, max_retries=5):
     raise Exception("Max retries exceeded")
 
 def save_all_annotations(annotator_id, session_id, all_data):
-    serializable_data = {
-        f"{k[0]}__{k[1]}": v for k, v in all_data.items() if isinstance(k, tuple)
-    }
-    if "feedback" in all_data:
-        serializable_data["feedback"] = all_data["feedback"]
-    
-    if "annotator_workflow" in all_data:
-        serializable_data["annotator_workflow"] = all_data["annotator_workflow"]
+    serializable_data = {k: v for k, v in all_data.items() if k != "_autosave_timestamp"}
 
-    json_data = json.dumps(serializable_data)
-    timestamp = datetime.datetime.now().isoformat()
+    json_data = orjson.dumps(serializable_data).decode()
+    # Nothing changed since the last successful write: skip the round-trip.
+    payload_hash = hash(json_data)
+    if payload_hash == st.session_state.get("_last_saved_hash"):
+        return
+    timestamp = _now().isoformat(timespec="seconds")
 
     sheet = get_sheet()
 
-    retry_api_call(lambda: sheet.append_row([annotator_id, session_id, json_data, timestamp]))
+    # Append-only: a resubmit adds a newer row rather than editing one in place,
+    # so saving never reads the sheet and never depends on row positions.
+    # The latest row per session_id is authoritative.
+    retry_api_call(lambda: sheet.append_row(
+        [annotator_id, session_id, json_data, timestamp], value_input_option="RAW"
+    ))
+    st.session_state["_last_saved_hash"] = payload_hash
+
+
+def load_saved_annotations(annotator_id, session_id):
+    # Best-effort resume: only column B (session ids) and the latest matching
+    # row are fetched (Worksheet.find would download every JSON blob), and any
+    # failure just means starting fresh rather than blocking the page, so the
+    # reads skip retry_api_call and its backoff sleeps.
+    try:
+        sheet = get_sheet()
+        session_ids = sheet.col_values(2)
+        if session_id not in session_ids:
+            return None
+        row_index = len(session_ids) - session_ids[::-1].index(session_id)
+        row_annotator, _, blob, timestamp = sheet.row_values(row_index)[:4]
+        if row_annotator != annotator_id:
+            return None
+        restored = orjson.loads(blob)
+    except Exception:
+        st.warning("Could not check Google Sheets for earlier submissions; starting fresh.")
+        return None
+
+    # Rows written before the orjson switch used json.dumps formatting, so
+    # hash the re-encoded payload, which is what the next save would produce.
+    st.session_state["_last_saved_hash"] = hash(orjson.dumps(restored).decode())
+    restored["_autosave_timestamp"] = timestamp
+    return restored
 
 
 
@@ -212,24 +254,23 @@ def main():
 
     if is_admin():
         st.title("🛠 Admin Panel – Saved Sessions")
-        files = [f for f in os.listdir(LOCAL_SAVE_DIR) if f.endswith(".json")]
+        files = list_saved_sessions()
 
         if not files:
             st.info("No saved sessions found.")
         else:
-            for f in files:
+            for f, mtime in files:
                 path = os.path.join(LOCAL_SAVE_DIR, f)
-                last_modified = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+                last_modified = datetime.datetime.fromtimestamp(mtime)
 
                 st.markdown(f"**{f}** – Last modified: {last_modified}")
                 
                 col1, col2 = st.columns([3, 1])
                 with col1:
-                    with open(path, "r") as fp:
-                        data = fp.read()
                     st.download_button(
                         label=f"⬇️ Download {f}",
-                        data=data,
+                        # Read only when clicked, not on every admin rerun
+                        data=lambda p=path: open(p, "rb").read(),
                         file_name=f,
                         mime="application/json",
                         key=f"download_{f}"
@@ -242,42 +283,16 @@ def main():
                 st.markdown("---")
         return  # ✅ Stops here so annotators never see annotation UI
     
-    if "page" not in st.session_state:
-        st.session_state.page = 0
+    st.session_state.setdefault("page", 0)
         # Auto-scroll if flagged (after Next/Previous rerun)
     if st.session_state.get("scroll_pending", False):
         st.session_state["scroll_pending"] = False  # Reset flag
-        st.components.v1.html("""
-        <script>
-        const selectors = [
-            '[data-testid="stVerticalBlock"]',
-            '[data-testid="stAppViewContainer"]',
-            'section.main',
-            '.block-container'
-        ];
-        function scrollNow() {
-            selectors.forEach(sel => {
-                const el = window.parent.document.querySelector(sel);
-                if (el) {
-                    el.scrollTop = 0;
-                    if (el.scrollTo) el.scrollTo({top:0, behavior:'instant'});
-                }
-            });
-            window.scrollTo(0,0);
-            window.parent.scrollTo(0,0);
-            const header = window.parent.document.querySelector('h1');
-            if (header && header.scrollIntoView) header.scrollIntoView({behavior:'instant', block:'start'});
-        }
-        [50,150,300].forEach(ms => setTimeout(scrollNow, ms));
-        </script>
-        """, height=0)
+        scroll_to_top()
 
-    if "instructions_expanded" not in st.session_state:
-        st.session_state.instructions_expanded = True
+    st.session_state.setdefault("instructions_expanded", True)
 
     # Check if page changed and scroll to top BEFORE rendering content
-    if "last_page" not in st.session_state:
-        st.session_state.last_page = st.session_state.page
+    st.session_state.setdefault("last_page", st.session_state.page)
     
     page_changed = st.session_state.page != st.session_state.last_page
     if page_changed:
@@ -344,6 +359,7 @@ Thank you!
 
     if not session_id:
         session_id = f"{annotator_id}_{uuid.uuid4().hex[:8]}"
+        st.session_state["_fresh_session"] = True
         st.query_params.update(annotator=annotator_id, session=session_id)
         st.rerun()
 
@@ -355,11 +371,11 @@ Thank you!
     st.session_state.session_id = session_id
 
     fic_paras, non_paras = load_data()
-    fiction_keys = list(fic_paras.keys())
-    nonfiction_keys = list(non_paras.keys())
-    assigned_fic = get_assigned_prompts(annotator_id, fiction_keys)
-    assigned_nonfic = get_assigned_prompts(annotator_id, nonfiction_keys)
-    all_prompts = [("fiction", p) for p in assigned_fic] + [("nonfiction", p) for p in assigned_nonfic]
+    # Prompt assignment is fixed per annotator, so derive it once per session
+    prompts_key = f"_all_prompts_{annotator_id}"
+    if prompts_key not in st.session_state:
+        st.session_state[prompts_key] = build_all_prompts(annotator_id, fic_paras, non_paras)
+    all_prompts = st.session_state[prompts_key]
 
     total_pages = len(all_prompts) + 1  # +1 for feedback page
     current_page = st.session_state.page
@@ -367,8 +383,15 @@ Thank you!
     # === Load saved progress if not loaded yet ===
     if "all_annotations" not in st.session_state:
         previous = load_from_local_file(annotator_id, session_id)
+        if previous is None and not st.session_state.get("_fresh_session"):
+            # No local autosave (e.g. already submitted, or the temp dir was
+            # wiped): fall back to the submitted row for this session.
+            previous = load_saved_annotations(annotator_id, session_id)
         if previous:
             st.session_state["all_annotations"] = previous
+            for k, ann in previous.items():
+                if isinstance(ann, dict) and "ranking" in ann:
+                    update_ranking_problem(k, ann["ranking"])
             st.info(f"✅ Resumed from last auto-save at {previous.get('_autosave_timestamp', 'unknown')}")
         else:
             st.session_state["all_annotations"] = {}
@@ -376,13 +399,17 @@ Thank you!
     # === TASK PAGES ===
     if current_page < len(all_prompts):
         mode, prompt = all_prompts[current_page]
-        paras_dict = fic_paras[prompt] if mode == "fiction" else non_paras[prompt]
-        paras = list(paras_dict.values())
-        key = (mode, prompt)
+        key = task_key(mode, prompt)
+        paras_cache = st.session_state.setdefault("_paras_cache", {})
+        if key not in paras_cache:
+            paras_dict = fic_paras[prompt] if mode == "fiction" else non_paras[prompt]
+            paras_cache[key] = tuple(paras_dict.values())
+        paras = paras_cache[key]
 
         if key not in st.session_state["all_annotations"]:
             st.session_state["all_annotations"][key] = {
-                "ranking": {f"Paragraph {i+1}": None for i in range(4)},
+                # Seeded with the selectboxes' default so first display is not an edit
+                "ranking": {f"Paragraph {i+1}": SCORE_OPTIONS[0] for i in range(4)},
                 "ratings": {
                     f"Paragraph {i+1}": {dim: 1 for dim in DIMENSIONS} for i in range(4)
                 }
@@ -393,184 +420,143 @@ Thank you!
 
         ratings = st.session_state["all_annotations"][key]["ratings"]
 
-        # Ratings
-        for i, para in enumerate(paras):
-            para_id = f"Paragraph {i+1}"
-            st.markdown(f"### {para_id}")
-            st.write(para)
-
-            for dim in DIMENSIONS:
-                stored_rating = ratings[para_id].get(dim, 1)
-                new_rating = st.radio(
-                    dim,
-                    [1, 2, 3, 4],
-                    index=stored_rating - 1,
-                    horizontal=True,
-                    key=f"rating_{key[0]}_{key[1]}_{para_id}_{dim}"
-                )
-                if new_rating != ratings[para_id][dim]:
-                    ratings[para_id][dim] = new_rating
-                    save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
-            st.markdown("---")
-        
-        st.markdown("### Need to reference the paragraphs again?")
-        # Toggle for showing the prompt
-        if "show_prompt" not in st.session_state:
-            st.session_state.show_prompt = False
-        if st.button("Show Prompt" if not st.session_state.show_prompt else "Hide Prompt"):
-            st.session_state.show_prompt = not st.session_state.show_prompt
-            st.rerun()
-        if st.session_state.show_prompt:
-            st.info(f"**Prompt:**\n\n{prompt}")
-
-        # Toggle for showing all paragraphs
-        if "show_all_paras" not in st.session_state:
-            st.session_state.show_all_paras = False
-        if st.button("Show All Paragraphs" if not st.session_state.show_all_paras else "Hide All Paragraphs"):
-            st.session_state.show_all_paras = not st.session_state.show_all_paras
-            st.rerun()
-
-        if st.session_state.show_all_paras:
+        # Widget keys for this task are formatted once, not on every rerun
+        widget_keys = st.session_state.setdefault("_widget_keys", {})
+        if key not in widget_keys:
+            widget_keys[key] = (
+                {
+                    (para_id, dim): f"rating_{mode}_{prompt}_{para_id}_{dim}"
+                    for para_id in ratings for dim in DIMENSIONS
+                },
+                {para_id: f"rank_{mode}_{prompt}_{para_id}" for para_id in ratings},
+            )
+        rating_keys, rank_keys = widget_keys[key]
+
+        # Widgets inside the form are buffered in the browser: rating, ranking
+        # and typing cost no rerun until Previous or Next is pressed.
+        changed = False
+        with st.form(f"form_{mode}_{prompt}", clear_on_submit=False):
+            # Ratings
             for i, para in enumerate(paras):
                 para_id = f"Paragraph {i+1}"
-                st.info(f"**{para_id}**\n\n{para}")
-        else:
-            # Individual toggle buttons for each paragraph
+                st.markdown(f"### {para_id}")
+                st.write(para)
+
+                para_ratings = ratings[para_id]
+                for dim in DIMENSIONS:
+                    stored_rating = para_ratings.get(dim, 1)
+                    new_rating = st.radio(
+                        dim,
+                        SCORE_OPTIONS,
+                        index=stored_rating - 1,
+                        horizontal=True,
+                        key=rating_keys[(para_id, dim)]
+                    )
+                    if new_rating != para_ratings.get(dim):
+                        para_ratings[dim] = new_rating
+                        changed = True
+                st.markdown("---")
+        
+            st.markdown("### Need to reference the paragraphs again?")
+            # Expanders open and close client-side, so referencing a paragraph
+            # costs no script rerun at all
+            with st.expander("Show Prompt"):
+                st.info(f"**Prompt:**\n\n{prompt}")
+
+            with st.expander("Show All Paragraphs"):
+                for i, para in enumerate(paras):
+                    para_id = f"Paragraph {i+1}"
+                    st.info(f"**{para_id}**\n\n{para}")
+
             for i, para in enumerate(paras):
                 para_id = f"Paragraph {i+1}"
-                toggle_key = f"ref_show_{key[0]}_{key[1]}_{para_id}"
-                if toggle_key not in st.session_state:
-                    st.session_state[toggle_key] = False
-
-                if st.button(f"{'Hide' if st.session_state[toggle_key] else 'Show'} {para_id}",
-                            key=f"btn_{toggle_key}"):
-                    st.session_state[toggle_key] = not st.session_state[toggle_key]
-                    st.rerun()
-                if st.session_state[toggle_key]:
+                with st.expander(f"Show {para_id}"):
                     st.info(f"**{para_id}**\n\n{para}")
 
-        # Rankings
-        st.markdown("### Rank the paragraphs (1 = best, 4 = worst)")
-        rankings = st.session_state["all_annotations"][key]["ranking"]
-        for para in rankings:
-            stored_rank = rankings[para]
-            new_rank = st.selectbox(
-                f"Rank for {para}:",
-                [1, 2, 3, 4],
-                index=(stored_rank - 1) if stored_rank in [1, 2, 3, 4] else 0,
-                key=f"rank_{key[0]}_{key[1]}_{para}"
-            )
-            if new_rank != rankings[para]:
-                rankings[para] = new_rank
-                save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
+            # Rankings
+            st.markdown("### Rank the paragraphs (1 = best, 4 = worst)")
+            rankings = st.session_state["all_annotations"][key]["ranking"]
+            for para in rankings:
+                stored_rank = rankings[para]
+                new_rank = st.selectbox(
+                    f"Rank for {para}:",
+                    SCORE_OPTIONS,
+                    index=(stored_rank - 1) if stored_rank in SCORE_OPTIONS else 0,
+                    key=rank_keys[para]
+                )
+                if new_rank != rankings[para]:
+                    rankings[para] = new_rank
+                    changed = True
+            rank_problem = update_ranking_problem(key, rankings)
         
-        # --- Feedback questions at end of each task ---
-        task_data = st.session_state["all_annotations"][key]
+            # --- Feedback questions at end of each task ---
+            task_data = st.session_state["all_annotations"][key]
 
-        if "feedback" not in task_data:
-            task_data["feedback"] = {
+            fb = task_data.setdefault("feedback", {
                 "reasoning_features": "",
                 "other_factors": ""
-            }
-
-        fb = task_data["feedback"]
-
-        st.markdown("### Task Feedback")
+            })
 
-        new_reasoning = st.text_area(
-            "1. Which of the quality dimensions (if any) were most helpful or reliable when deciding your overall rankings?",
-            fb["reasoning_features"],
-            key=f"reasoning_{key[0]}_{key[1]}"
-        )
-        if new_reasoning != fb["reasoning_features"]:
-            fb["reasoning_features"] = new_reasoning
-            save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
-
-        new_factors = st.text_area(
-            "2. Were there any other factors, beyond the listed dimensions, that influenced your ranking decisions? If so please list them and explain how.",
-            fb["other_factors"],
-            key=f"factors_{key[0]}_{key[1]}"
-        )
-        if new_factors != fb["other_factors"]:
-            fb["other_factors"] = new_factors
-            save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
+            st.markdown("### Task Feedback")
 
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Previous") and current_page > 0:
-                st.session_state.page -= 1
-                # Force page refresh with query parameter to reset scroll
-                st.session_state["scroll_pending"] = True
-                st.query_params.update(
-                    annotator=annotator_id, 
-                    session=session_id,
-                    _scroll_reset=str(datetime.datetime.now().timestamp())
-                )
-                
-                st.rerun()
-        with col2:
-            if st.button("Next"):
-                ranks = list(rankings.values())
-                if None in ranks:
-                    st.error("Please assign a rank to every paragraph.")
-                elif len(set(ranks)) < 4:
-                    st.error("Duplicate ranks detected.")
-                else:
-                    st.session_state.page += 1
-                    st.session_state.instructions_expanded = False
+            new_reasoning = st.text_area(
+                "1. Which of the quality dimensions (if any) were most helpful or reliable when deciding your overall rankings?",
+                fb["reasoning_features"],
+                key=f"reasoning_{mode}_{prompt}"
+            )
+            if new_reasoning != fb["reasoning_features"]:
+                fb["reasoning_features"] = new_reasoning
+                changed = True
+
+            new_factors = st.text_area(
+                "2. Were there any other factors, beyond the listed dimensions, that influenced your ranking decisions? If so please list them and explain how.",
+                fb["other_factors"],
+                key=f"factors_{mode}_{prompt}"
+            )
+            if new_factors != fb["other_factors"]:
+                fb["other_factors"] = new_factors
+                changed = True
+
+            # Stored values match the widget defaults, so changes here are real
+            # edits submitted via Previous/Next: flush right away
+            if changed:
+                mark_dirty()
+                maybe_flush(annotator_id, session_id, force=True)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.form_submit_button("Previous") and current_page > 0:
+                    st.session_state.page -= 1
                     # Force page refresh with query parameter to reset scroll
                     st.session_state["scroll_pending"] = True
                     st.query_params.update(
                         annotator=annotator_id, 
                         session=session_id,
-                        _scroll_reset=str(datetime.datetime.now().timestamp())
+                        _scroll_reset=str(time.time())
                     )
+                
                     st.rerun()
-                    st.components.v1.html("""
-                <script>
-                const selectors = [
-                    '[data-testid="stVerticalBlock"]',
-                    '[data-testid="stAppViewContainer"]',
-                    'section.main',
-                    '.block-container'
-                ];
-                selectors.forEach(sel => {
-                    const el = window.parent.document.querySelector(sel);
-                    if (el) {
-                        el.scrollTop = 0;
-                        if (el.scrollTo) el.scrollTo({top:0, behavior:'instant'});
-                    }
-                });
-                window.scrollTo(0,0);
-                window.parent.scrollTo(0,0);
-                const header = window.parent.document.querySelector('h1');
-                if (header && header.scrollIntoView) header.scrollIntoView({behavior:'instant', block:'start'});
-                </script>
-                """, height=0)
+            with col2:
+                if st.form_submit_button("Next"):
+                    if rank_problem == "incomplete":
+                        st.error("Please assign a rank to every paragraph.")
+                    elif rank_problem == "duplicate":
+                        st.error("Duplicate ranks detected.")
+                    else:
+                        st.session_state.page += 1
+                        st.session_state.instructions_expanded = False
+                        # Force page refresh with query parameter to reset scroll
+                        st.session_state["scroll_pending"] = True
+                        st.query_params.update(
+                            annotator=annotator_id, 
+                            session=session_id,
+                            _scroll_reset=str(time.time())
+                        )
+                        st.rerun()
         
         # Back to Top button (appears below navigation)
-            if st.button("⬆️ Back to Top"):
-                st.components.v1.html("""
-                <script>
-                const selectors = [
-                    '[data-testid="stVerticalBlock"]',
-                    '[data-testid="stAppViewContainer"]',
-                    'section.main',
-                    '.block-container'
-                ];
-                selectors.forEach(sel => {
-                    const el = window.parent.document.querySelector(sel);
-                    if (el) {
-                        el.scrollTop = 0;
-                        if (el.scrollTo) el.scrollTo({top:0, behavior:'instant'});
-                    }
-                });
-                window.scrollTo(0,0);
-                window.parent.scrollTo(0,0);
-                const header = window.parent.document.querySelector('h1');
-                if (header && header.scrollIntoView) header.scrollIntoView({behavior:'instant', block:'start'});
-                </script>
-                """, height=0)
+        if st.button("⬆️ Back to Top"):
+            scroll_to_top()
 
 
    # === FINAL FEEDBACK PAGE ===
@@ -578,8 +564,7 @@ Thank you!
         st.header("Final Feedback")
 
         # Store final workflow as its own key, not inside "feedback"
-        if "annotator_workflow" not in st.session_state["all_annotations"]:
-            st.session_state["all_annotations"]["annotator_workflow"] = ""
+        st.session_state["all_annotations"].setdefault("annotator_workflow", "")
 
         st.markdown("### 3. Briefly describe your workflow")
 
@@ -598,22 +583,15 @@ Thank you!
         )
         if new_workflow != st.session_state["all_annotations"]["annotator_workflow"]:
             st.session_state["all_annotations"]["annotator_workflow"] = new_workflow
-            save_to_local_file(annotator_id, session_id, st.session_state["all_annotations"])
+            mark_dirty()
 
         if st.button("Submit All Annotations"):
-            incomplete = False
-            duplicate_found = False
-            for k, ann in st.session_state["all_annotations"].items():
-                if isinstance(k, tuple):
-                    ranks = list(ann["ranking"].values())
-                    if None in ranks:
-                        incomplete = True
-                    elif len(set(ranks)) < 4:
-                        duplicate_found = True
-
-            if incomplete:
+            maybe_flush(annotator_id, session_id, force=True)
+            problems = st.session_state.get("_rank_problems", {}).values()
+
+            if "incomplete" in problems:
                 st.error("Please assign ranks for all paragraphs before submitting.")
-            elif duplicate_found:
+            elif "duplicate" in problems:
                 st.error("Duplicate ranks detected.")
             else:
                 save_all_annotations(annotator_id, session_id, st.session_state["all_annotations"])
@@ -629,9 +607,12 @@ Thank you!
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Back to Last Task", key="feedback_back") and current_page > 0:
+                maybe_flush(annotator_id, session_id, force=True)
                 st.session_state.page = len(all_prompts) - 1
                 st.rerun()
 
+    maybe_flush(annotator_id, session_id)
+
     # Show autosave timestamp
     ts = st.session_state["all_annotations"].get("_autosave_timestamp", "")
     if ts: